@@ -0,0 +1,33 @@
+import argparse
+
+import h5py
+import numpy as np
+
+
+def convert_hdf5(src_path, dst_path):
+    """Re-save every dataset of an episode file contiguous and uncompressed, keeping all the attributes.
+
+    The recorder stores the images in per-frame chunks, reading the converted file back is a single contiguous read
+    per dataset with no chunk lookup nor decompression.
+    """
+    with h5py.File(src_path, "r") as src, h5py.File(dst_path, "w") as dst:
+        dst.attrs.update(src.attrs)
+
+        def copy_item(name, obj):
+            if isinstance(obj, h5py.Dataset):
+                dataset = dst.create_dataset(name, data=np.asarray(obj), chunks=None, compression=None)
+                dataset.attrs.update(obj.attrs)
+            else:
+                dst.require_group(name).attrs.update(obj.attrs)
+
+        src.visititems(copy_item)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert an HDF5 trace file to contiguous uncompressed datasets")
+    parser.add_argument("--file_path", type=str, default="data/episode_5.hdf5", help="Path to HDF5 file")
+    parser.add_argument(
+        "--save_file", type=str, default="data/episode_5_contiguous.hdf5", help="Path to save the converted file"
+    )
+    args = parser.parse_args()
+    convert_hdf5(args.file_path, args.save_file)
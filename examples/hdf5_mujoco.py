@@ -4,6 +4,7 @@ import time
 import h5py
 import mujoco
 import mujoco.viewer
+import numpy as np
 
 from gym_lowcostrobot.simulated_robot import SimulatedRobot
 
@@ -11,33 +12,34 @@ from gym_lowcostrobot.simulated_robot import SimulatedRobot
 def do_replay_hdf5(args):
     # Specify the path to your HDF5 file
     with h5py.File(args.file_path, "r") as file:
-        m = mujoco.MjModel.from_xml_path("gym_lowcostrobot/assets/low_cost_robot_6dof/lift_cube.xml")
-        data = mujoco.MjData(m)
-        robot = SimulatedRobot(m, data)
-
-        # group_action = file["action"]
-        group_qpos = file["observations/qpos"]
-
-        with mujoco.viewer.launch_passive(m, data) as viewer:
-            # Run the simulation
-            step = 0
-            while viewer.is_running():
-                step_start = time.time()
-
-                # Step the simulation forward
-                robot.set_target_qpos(group_qpos[step][0:6])
-                mujoco.mj_step(m, data)
-
-                viewer.sync()
-
-                # Rudimentary time keeping, will drift relative to wall clock.
-                time_until_next_step = m.opt.timestep - (time.time() - step_start)
-                if time_until_next_step > 0:
-                    time.sleep(time_until_next_step)
-
-                print(group_qpos[step][0:6])
-                step += 1
-                step = step % len(group_qpos)
+        # Read the whole trajectory at once, the replay loop then only indexes a NumPy array
+        qpos = np.asarray(file["observations/qpos"])
+
+    m = mujoco.MjModel.from_xml_path("gym_lowcostrobot/assets/low_cost_robot_6dof/lift_cube.xml")
+    data = mujoco.MjData(m)
+    robot = SimulatedRobot(m, data)
+    nb_steps = len(qpos)
+
+    with mujoco.viewer.launch_passive(m, data) as viewer:
+        # Run the simulation
+        step = 0
+        while viewer.is_running():
+            step_start = time.time()
+
+            # Step the simulation forward
+            robot.set_target_qpos(qpos[step, 0:6])
+            mujoco.mj_step(m, data)
+
+            viewer.sync()
+
+            # Rudimentary time keeping, will drift relative to wall clock.
+            time_until_next_step = m.opt.timestep - (time.time() - step_start)
+            if time_until_next_step > 0:
+                time.sleep(time_until_next_step)
+
+            print(qpos[step, 0:6])
+            step += 1
+            step = step % nb_steps
 
 
 if __name__ == "__main__":
@@ -1,7 +1,15 @@
+from .batch_lift_cube_env import BatchLiftCubeEnv
 from .lift_cube_env import LiftCubeEnv
 from .pick_place_cube_env import PickPlaceCubeEnv
 from .push_cube_env import PushCubeEnv
 from .reach_cube_env import ReachCubeEnv
 from .stack_two_cubes_env import StackTwoCubesEnv
 
-__all__ = ["LiftCubeEnv", "PickPlaceCubeEnv", "PushCubeEnv", "ReachCubeEnv", "StackTwoCubesEnv"]
+__all__ = [
+    "BatchLiftCubeEnv",
+    "LiftCubeEnv",
+    "PickPlaceCubeEnv",
+    "PushCubeEnv",
+    "ReachCubeEnv",
+    "StackTwoCubesEnv",
+]
@@ -0,0 +1,314 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import gymnasium as gym
+import mujoco
+import numpy as np
+from gymnasium import spaces
+from gymnasium.utils import seeding
+
+from gym_lowcostrobot import ASSETS_PATH
+from gym_lowcostrobot.envs.jit import NUMBA_AVAILABLE, njit
+
+
+def ik_step(qpos, jac, error, nullspace_qdot, regularization=1e-6, step=0.05):
+    """
+    Computes one damped least-squares inverse kinematics step for a batch of arms.
+
+    All the arguments are batched along their first axis, so that the whole batch is solved with a single call.
+
+    :param qpos: numpy array of current joint positions, shape (B, nb_dof)
+    :param jac: numpy array of end effector position Jacobians, shape (B, 3, nb_dof)
+    :param error: numpy array of target minus current end effector positions, shape (B, 3)
+    :param nullspace_qdot: numpy array of joint velocities to project in the nullspace of the Jacobian, shape (B, nb_dof)
+    :param regularization: float, damping factor of the least-squares problem
+    :param step: float, step size for the iteration
+    :return: numpy array of new joint positions, shape (B, nb_dof)
+    """
+    nb_dof = qpos.shape[-1]
+    jac_t = np.swapaxes(jac, -1, -2)
+
+    # Solve the damped normal equations (J^T J + reg I) qdot = J^T error
+    jac_reg = jac_t @ jac + regularization * np.eye(nb_dof)
+    qdot = np.linalg.solve(jac_reg, jac_t @ error[..., None])[..., 0]
+
+    # Keep the joints close to the home position without moving the end effector, the nullspace projector of J is
+    # I - Q Q^T with Q an orthonormal basis of the rows of J
+    Q, _ = np.linalg.qr(jac_t)
+    nullspace = np.eye(nb_dof) - Q @ np.swapaxes(Q, -1, -2)
+    qdot += (nullspace @ nullspace_qdot[..., None])[..., 0]
+
+    # Normalize joint velocities to avoid excessive movements
+    qdot /= np.maximum(np.linalg.norm(qdot, axis=-1, keepdims=True), 1.0)
+    return qpos + qdot * step
+
+
+@njit(cache=True)
+def _step_post_loop(ee_pos, cube_pos, threshold, out_reward, out_success):
+    for i in range(ee_pos.shape[0]):
+        d2 = 0.0
+        for j in range(3):
+            diff = ee_pos[i, j] - cube_pos[i, j]
+            d2 += diff * diff
+        out_reward[i] = cube_pos[i, 2] - threshold - np.sqrt(d2)
+        out_success[i] = d2 < 0.05**2
+
+
+def step_post(ee_pos, cube_pos, threshold, out_reward, out_success):
+    """
+    Computes the rewards and the success flags of a batch of sub-environments after a simulation step.
+
+    The batch is processed by a loop compiled with numba when it is installed, and by vectorized NumPy otherwise.
+
+    :param ee_pos: numpy array of end effector positions, shape (B, 3)
+    :param cube_pos: numpy array of cube positions, shape (B, 3)
+    :param threshold: float, height threshold of the cube
+    :param out_reward: numpy array receiving the rewards, shape (B,)
+    :param out_success: numpy array receiving whether the end effector is within 5 cm of the cube, shape (B,)
+    """
+    if NUMBA_AVAILABLE:
+        _step_post_loop(ee_pos, cube_pos, threshold, out_reward, out_success)
+        return
+    diff = ee_pos - cube_pos
+    d2 = np.einsum("ij,ij->i", diff, diff)
+    np.sqrt(d2, out=out_reward)
+    np.subtract(cube_pos[:, 2] - threshold, out_reward, out=out_reward)
+    np.less(d2, 0.05**2, out=out_success)
+
+
+class BatchLiftCubeEnv(gym.vector.VectorEnv):
+    """
+    ## Description
+
+    Batched version of `LiftCubeEnv`. `num_envs` copies of the task share a single `MjModel`, each with its own
+    `MjData`, and are stepped in a thread pool behind one call to `step`. MuJoCo releases the GIL while stepping, so the
+    copies run in parallel and the Python overhead of a step is paid once for the whole batch.
+
+    Only the "state" observation mode of `LiftCubeEnv` is supported.
+
+    ## Action space
+
+    The action space is a `(num_envs, 6)` box in "joint" mode and a `(num_envs, 4)` box in "ee" mode, each row being
+    the action of one sub-environment, see `LiftCubeEnv`. In "ee" mode, the inverse kinematics of all the
+    sub-environments are solved together, see `ik_step`.
+
+    ## Observation space
+
+    The observation space is a dictionary of batched arrays, assembled from the batched state of the sub-environments
+    (`qpos_soa`, `ee_pos_soa` and `cube_pos_soa`, one row per sub-environment):
+
+    - `"ee_pos"`: the position of the end effector, as (x, y, z), shape (num_envs, 3)
+    - `"gripper_qpos"`: the angle of the gripper joint in radians, shape (num_envs, 1)
+    - `"object_qpos"`: the position of the cube, as (x, y, z), shape (num_envs, 3)
+
+    ## Reward
+
+    Same as `LiftCubeEnv`, computed for all the sub-environments at once by `step_post`. `info["is_success"]` flags
+    the sub-environments whose end effector is within 5 cm of the cube.
+
+    ## Episode end
+
+    A sub-environment is truncated after `episode_length` steps and is then reset automatically within the same call to
+    `step`. Its last observation is stored in `info["final_observation"]`, and `info["_final_observation"]` flags which
+    sub-environments were reset.
+
+    ## Arguments
+
+    - `num_envs (int)`: the number of sub-environments, default is 8.
+    - `action_mode (str)`: the action mode, can be "joint" or "ee", default is "joint", see section "Action space".
+    - `num_workers (int)`: the number of threads used to step the sub-environments, default is the number of CPUs.
+    - `copy (bool)`: whether to return a copy of the observation buffers, default is True.
+    """
+
+    metadata = {"render_modes": [], "render_fps": 50}
+
+    def __init__(self, num_envs=8, action_mode="joint", num_workers=None, copy=True):
+        # Load the MuJoCo model, shared by all the sub-environments
+        self.model = mujoco.MjModel.from_xml_path(os.path.join(ASSETS_PATH, "lift_cube.xml"), {})
+        self.datas = [mujoco.MjData(self.model) for _ in range(num_envs)]
+        self.copy = copy
+
+        # Set the action and observation spaces
+        self.action_mode = action_mode
+        action_shape = {"joint": 6, "ee": 4}[action_mode]
+        self.single_action_space = spaces.Box(low=-1.0, high=1.0, shape=(action_shape,), dtype=np.float32)
+        self.single_observation_space = spaces.Dict(
+            {
+                "ee_pos": spaces.Box(low=-10, high=10, shape=(3,)),
+                "gripper_qpos": spaces.Box(low=-np.pi, high=np.pi, shape=(1,)),
+                "object_qpos": spaces.Box(low=-10.0, high=10.0, shape=(3,)),
+            }
+        )
+        super().__init__(num_envs, self.single_observation_space, self.single_action_space)
+
+        # Batched state of the sub-environments, one row per sub-environment, filled in place by the workers
+        self.qpos_soa = np.zeros((num_envs, self.model.nq))
+        self.ee_pos_soa = np.zeros((num_envs, 3))
+        self.cube_pos_soa = np.zeros((num_envs, 3))
+
+        # Preallocate the batched observation, assembled from the batched state
+        self._observation = {
+            "ee_pos": np.zeros((num_envs, 3), dtype=np.float32),
+            "gripper_qpos": np.zeros((num_envs, 1), dtype=np.float32),
+            "object_qpos": np.zeros((num_envs, 3), dtype=np.float32),
+        }
+        self._target_qpos = np.zeros((num_envs, 6))
+        self._step_idx = np.zeros(num_envs, dtype=np.int64)
+        self._jac = np.zeros((num_envs, 3, self.model.nv))
+        self._ik_qpos = np.zeros((num_envs, 6))
+        self._ik_target = np.zeros((num_envs, 3))
+        self._ik_error = np.zeros((num_envs, 3))
+        self._rewards = np.zeros(num_envs)
+        self._is_success = np.zeros(num_envs, dtype=bool)
+
+        self._pool = ThreadPoolExecutor(max_workers=num_workers or os.cpu_count())
+        self.np_random, _ = seeding.np_random()
+
+        # Set additional utils, same as LiftCubeEnv
+        self.control_freq = 50
+        self.threshold_height = 0.5
+        self.episode_length = 200
+        self.target_low = np.array([-3.14159, -1.5708, -1.48353, -1.91986, -2.96706, -1.74533])
+        self.target_high = np.array([3.14159, 1.22173, 1.74533, 1.91986, 2.96706, 0.0523599])
+        self.q0 = (self.target_high + self.target_low) / 2  # home position
+        self.q0[3] += 1.57
+        self._act_scale = (self.target_high - self.target_low) / 2
+        self.cube_origin_pos = np.array([0.03390873, 0.22571199, 0.04])
+        self._ee_id = self.model.body("moving_side").id
+
+        # Compile the post-step function ahead of the first step
+        step_post(self.ee_pos_soa, self.cube_pos_soa, self.threshold_height, self._rewards, self._is_success)
+
+    def _reset_one(self, i):
+        # Sample the cube position in a square in front of the robot, as in LiftCubeEnv
+        cube_pos = self.cube_origin_pos.copy()
+        cube_pos[:2] += self.np_random.uniform(-0.05, 0.05, size=2)
+        data = self.datas[i]
+        mujoco.mj_resetData(self.model, data)
+        data.qpos[:3] = cube_pos
+        data.qpos[3:7] = [1.0, 0.0, 0.0, 0.0]
+        mujoco.mj_forward(self.model, data)
+        self._step_idx[i] = 0
+        self._fill_state(i)
+
+    def _fill_state(self, i):
+        # qpos is [x, y, z, qw, qx, qy, qz, q1, q2, q3, q4, q5, q6, gripper]
+        data = self.datas[i]
+        self.qpos_soa[i] = data.qpos
+        self.ee_pos_soa[i] = data.xpos[self._ee_id]
+        self.cube_pos_soa[i] = data.qpos[:3]
+
+    def _step_one(self, i):
+        data = self.datas[i]
+        data.ctrl = self._target_qpos[i]
+        mujoco.mj_step(self.model, data, nstep=int(200 / self.control_freq))
+        self._fill_state(i)
+
+    def _jacobian_one(self, i):
+        # Compute the kinematics and the Jacobian of the end effector at the IK joint positions
+        data = self.datas[i]
+        data.qpos[7:13] = self._ik_qpos[i]
+        mujoco.mj_kinematics(self.model, data)
+        mujoco.mj_comPos(self.model, data)
+        mujoco.mj_jac(self.model, data, self._jac[i], None, self._ik_target[i], self._ee_id)
+        self._ik_error[i] = self._ik_target[i] - data.xpos[self._ee_id]
+
+    def _run(self, fn, indices):
+        for future in [self._pool.submit(fn, i) for i in indices]:
+            future.result()
+
+    def inverse_kinematics(self, ee_target_pos, step=0.05, regularization=1e-6, nullspace_weight=1.0):
+        """
+        Computes the inverse kinematics of all the sub-environments to reach the target end effector positions.
+
+        :param ee_target_pos: numpy array of target end effector positions, shape (num_envs, 3)
+        :param step: float, step size for the iteration
+        :param regularization: float, regularization factor for the pseudoinverse computation
+        :param nullspace_weight: float, weight for the nullspace regularization
+        :return: numpy array of target joint positions, shape (num_envs, 6)
+        """
+        ERROR_TOLERANCE = 1e-2
+        MIN_STEP_NORM = 1e-4
+        MAX_ITERATIONS = 5
+        q_pos = self.qpos_soa[:, 7:13]
+        self._ik_qpos[:] = q_pos
+        self._ik_target[:] = ee_target_pos
+        nullspace_qdot = nullspace_weight * (self.q0 - q_pos)
+        active = np.linalg.norm(self._ik_target - self.ee_pos_soa, axis=1) > ERROR_TOLERANCE
+
+        for _ in range(MAX_ITERATIONS):
+            indices = np.flatnonzero(active)
+            if len(indices) == 0:
+                break
+            self._run(self._jacobian_one, indices)
+            qpos = ik_step(
+                self._ik_qpos[indices],
+                self._jac[indices, :, 6:12],
+                self._ik_error[indices],
+                nullspace_qdot[indices],
+                regularization=regularization,
+                step=step,
+            )
+            step_norm = np.linalg.norm(qpos - self._ik_qpos[indices], axis=1)
+            self._ik_qpos[indices] = qpos
+
+            # Stop the sub-environments that reached the target or whose joints barely move
+            error_norm = np.linalg.norm(self._ik_error[indices], axis=1)
+            active[indices] = (error_norm > ERROR_TOLERANCE) & (step_norm >= MIN_STEP_NORM)
+
+        # Restore the joint positions, the simulation is only stepped by the controller
+        for data, qpos in zip(self.datas, q_pos):
+            data.qpos[7:13] = qpos
+        return self._ik_qpos.copy()
+
+    def _get_observation(self):
+        np.copyto(self._observation["ee_pos"], self.ee_pos_soa)
+        np.copyto(self._observation["gripper_qpos"], self.qpos_soa[:, 12:13])
+        np.copyto(self._observation["object_qpos"], self.cube_pos_soa)
+        if self.copy:
+            return {key: value.copy() for key, value in self._observation.items()}
+        return self._observation
+
+    def reset(self, seed=None, options=None):
+        if seed is not None:
+            self.np_random, _ = seeding.np_random(seed)
+        for i in range(self.num_envs):
+            self._reset_one(i)
+        return self._get_observation(), {}
+
+    def step(self, actions):
+        if self.action_mode == "ee":
+            # Use inverse kinematics to get the joint action wrt the end effector current position and displacement
+            ee_target_pos = self.ee_pos_soa + actions[:, :3]
+            self._target_qpos[:] = self.inverse_kinematics(ee_target_pos)
+            self._target_qpos[:, -1] = actions[:, -1]
+        elif self.action_mode == "joint":
+            # Scale the actions to the joint ranges, for all the sub-environments at once
+            np.multiply(actions, self._act_scale, out=self._target_qpos)
+            np.add(self._target_qpos, self.q0, out=self._target_qpos)
+        else:
+            raise ValueError("Invalid action mode, must be 'ee' or 'joint'")
+
+        # Step the sub-environments in parallel
+        self._run(self._step_one, range(self.num_envs))
+
+        # Compute the rewards of all the sub-environments at once
+        self._step_idx += 1
+        step_post(self.ee_pos_soa, self.cube_pos_soa, self.threshold_height, self._rewards, self._is_success)
+        rewards = self._rewards.copy()
+        terminated = np.zeros(self.num_envs, dtype=bool)
+        truncated = self._step_idx >= self.episode_length
+        observation = self._get_observation()
+        info = {"step": self._step_idx.copy(), "is_success": self._is_success.copy()}
+
+        # Reset the sub-environments that reached the end of their episode
+        if truncated.any():
+            info["final_observation"] = {key: value.copy() for key, value in self._observation.items()}
+            info["_final_observation"] = truncated
+            for i in np.flatnonzero(truncated):
+                self._reset_one(i)
+            observation = self._get_observation()
+        return observation, rewards, terminated, truncated, info
+
+    def close_extras(self, **kwargs):
+        self._pool.shutdown(wait=True)
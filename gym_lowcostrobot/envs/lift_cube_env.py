@@ -1,4 +1,6 @@
+import math
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 import gymnasium as gym
 import mujoco
@@ -7,15 +9,52 @@ import numpy as np
 from gymnasium import Env, spaces
 
 from gym_lowcostrobot import ASSETS_PATH
+from gym_lowcostrobot.envs.jit import njit
 
-def displace_object(square_size=0.15, invert_y=False, origin_pos=[0, 0, 0]):
+
+@njit(cache=True, fastmath=True)
+def _ik_inner(jac, qpos, error, nullspace_qdot, eye, regularization, step, out_qdot):
+    """
+    Computes one damped least-squares inverse kinematics step and updates the joint positions in place.
+
+    :param jac: numpy array of the end effector position Jacobian wrt the arm joints, shape (3, nb_dof)
+    :param qpos: numpy array of the arm joint positions, updated in place, shape (nb_dof,)
+    :param error: numpy array of target minus current end effector position, shape (3,)
+    :param nullspace_qdot: numpy array of joint velocities to project in the nullspace of the Jacobian, shape (nb_dof,)
+    :param eye: numpy array of the identity matrix, shape (nb_dof, nb_dof)
+    :param regularization: float, damping factor of the least-squares problem
+    :param step: float, step size for the iteration
+    :param out_qdot: numpy array receiving the joint velocities, shape (nb_dof,)
+    """
+    jac = np.ascontiguousarray(jac)
+    jac_t = np.ascontiguousarray(jac.T)
+
+    # Solve the damped normal equations (J^T J + reg I) qdot = J^T error
+    qdot = np.linalg.solve(jac_t @ jac + regularization * eye, jac_t @ error)
+
+    # try to keep the joint close to home position, otherwise the robot will move even if the target is reached
+    # the nullspace projector of J is I - Q Q^T, with Q an orthonormal basis of the rows of J
+    Q, _ = np.linalg.qr(jac_t)
+    Q = np.ascontiguousarray(Q)
+    qdot += (eye - Q @ np.ascontiguousarray(Q.T)) @ nullspace_qdot
+
+    # Normalize joint velocities to avoid excessive movements
+    qdot_norm = np.sqrt(np.sum(qdot * qdot))
+    if qdot_norm > 1.0:
+        qdot /= qdot_norm
+
+    out_qdot[:] = qdot
+    qpos += qdot * step
+
+
+def displace_object(square_size=0.15, invert_y=False, origin_pos=[0, 0, 0], np_random=np.random):
     ### Sample a position in a square in front of the robot
     if not invert_y:
-        x = np.random.uniform(origin_pos[0] - square_size / 2, origin_pos[0] + square_size / 2)
-        y = np.random.uniform(origin_pos[1] - square_size / 2, origin_pos[1] + square_size / 2)
+        x = np_random.uniform(origin_pos[0] - square_size / 2, origin_pos[0] + square_size / 2)
+        y = np_random.uniform(origin_pos[1] - square_size / 2, origin_pos[1] + square_size / 2)
     else:
-        x = np.random.uniform(origin_pos[0] + square_size / 2, origin_pos[0] - square_size / 2)
-        y = np.random.uniform(origin_pos[1] + square_size / 2, origin_pos[1] - square_size / 2)
+        x = np_random.uniform(origin_pos[0] + square_size / 2, origin_pos[0] - square_size / 2)
+        y = np_random.uniform(origin_pos[1] + square_size / 2, origin_pos[1] - square_size / 2)
     # env.data.qpos[:3] = np.array([x, y, origin_pos[2]])
     return np.array([x, y, origin_pos[2]])
 
@@ -55,8 +94,10 @@ class LiftCubeEnv(Env):
 
     - `"arm_qpos"`: the joint angles of the robot arm in radians, shape (6,)
     - `"arm_qvel"`: the joint velocities of the robot arm in radians per second, shape (6,)
-    - `"image_front"`: the front image of the camera of size (240, 320, 3)
-    - `"image_top"`: the top image of the camera of size (240, 320, 3)
+    - `"image_front"`: the front image of the camera of size (height, width, 3), or (3, height, width) in "chw" image
+        layout, (240, 320, 3) by default
+    - `"image_top"`: the top image of the camera of size (height, width, 3), or (3, height, width) in "chw" image
+        layout, (240, 320, 3) by default
     - `"cube_pos"`: the position of the cube, as (x, y, z)
 
     Three observation modes are available: "image" (default), "state", and "both".
@@ -69,6 +110,10 @@ class LiftCubeEnv(Env):
     | `"image_top"`   | ✓         |           | ✓        |
     | `"cube_pos"`    |           | ✓         | ✓        |
 
+    By default, `reset` and `step` return new arrays at every call. With `reuse_obs_buffers=True`, the observation dict
+    returned by `step` and its arrays, images included, are reused from one step to the next: they are only valid until
+    the next call to `step`, copy them if they need to be kept.
+
     ## Reward
 
     The reward is the sum of two terms: the height of the cube above the threshold and the negative distance between the
@@ -80,11 +125,32 @@ class LiftCubeEnv(Env):
         section "Observation space".
     - `action_mode (str)`: the action mode, can be "joint" or "ee", default is "joint", see section "Action space".
     - `render_mode (str)`: the render mode, can be "human" or "rgb_array", default is None.
+    - `image_layout (str)`: the memory layout of the images, can be "hwc" (height, width, channel) or "chw" (channel,
+        height, width), default is "hwc". The "chw" images are contiguous, ready for channel-first policies.
+    - `image_size (tuple)`: the (height, width) of the images, default is (240, 320). Smaller images are cheaper to
+        render and to move to the policy.
+    - `obs_dtype (type)`: the dtype of the non-image observations, default is np.float32. np.float16 halves their
+        size.
+    - `async_render (bool)`: whether to render the images on a background thread, overlapping with the simulation of
+        the next step, default is False. The images returned by `step` are then those of the previous step, while
+        `reset` still returns the images of the current state. It has no effect in the "state" observation mode.
+    - `reuse_obs_buffers (bool)`: whether `step` returns the same preallocated observation buffers at every step
+        instead of new arrays, default is False. This saves an allocation per step, see section "Observation space".
     """
 
     metadata = {"render_modes": ["human", "rgb_array"], "render_fps": 50}
 
-    def __init__(self, observation_mode="image", action_mode="joint", render_mode=None):
+    def __init__(
+        self,
+        observation_mode="image",
+        action_mode="joint",
+        render_mode=None,
+        image_layout="hwc",
+        async_render=False,
+        image_size=(240, 320),
+        obs_dtype=np.float32,
+        reuse_obs_buffers=False,
+    ):
         # Load the MuJoCo model and data
         self.model = mujoco.MjModel.from_xml_path(os.path.join(ASSETS_PATH, "lift_cube.xml"), {})
         self.data = mujoco.MjData(self.model)
@@ -98,19 +164,55 @@ class LiftCubeEnv(Env):
 
         # Set the observations space
         self.observation_mode = observation_mode
+        self.image_layout = image_layout
+        self.async_render = async_render
+        self.reuse_obs_buffers = reuse_obs_buffers
+        self.image_size = image_size
+        height, width = image_size
+        image_shape = {"hwc": (height, width, 3), "chw": (3, height, width)}[image_layout]
         observation_subspaces = {
             # "arm_qpos": spaces.Box(low=-np.pi, high=np.pi, shape=(6,)),
             # "arm_qvel": spaces.Box(low=-10.0, high=10.0, shape=(6,)),
-            "ee_pos": spaces.Box(low=-10, high=10, shape=(3,)),
-            "gripper_qpos": spaces.Box(low=-np.pi, high=np.pi, shape=(1,)),
+            "ee_pos": spaces.Box(low=-10, high=10, shape=(3,), dtype=obs_dtype),
+            "gripper_qpos": spaces.Box(low=-np.pi, high=np.pi, shape=(1,), dtype=obs_dtype),
         }
         if self.observation_mode in ["image", "both"]:
-            observation_subspaces["image_front"] = spaces.Box(0, 255, shape=(240, 320, 3), dtype=np.uint8)
-            observation_subspaces["image_top"] = spaces.Box(0, 255, shape=(240, 320, 3), dtype=np.uint8)
-            self.renderer = mujoco.Renderer(self.model)
+            observation_subspaces["image_front"] = spaces.Box(0, 255, shape=image_shape, dtype=np.uint8)
+            observation_subspaces["image_top"] = spaces.Box(0, 255, shape=image_shape, dtype=np.uint8)
+            # One renderer per camera, each rendering into a preallocated image buffer
+            if self.async_render:
+                # The renderers are created on the render thread, where their OpenGL context stays current
+                self._render_pool = ThreadPoolExecutor(max_workers=1)
+                self.renderer_front = self._render_pool.submit(mujoco.Renderer, self.model, height, width).result()
+                self.renderer_top = self._render_pool.submit(mujoco.Renderer, self.model, height, width).result()
+            else:
+                self.renderer_front = mujoco.Renderer(self.model, height, width)
+                self.renderer_top = mujoco.Renderer(self.model, height, width)
+            self.camera_front = mujoco.MjvCamera()
+            self.camera_front.type = mujoco.mjtCamera.mjCAMERA_FIXED
+            self.camera_front.fixedcamid = self.model.camera("camera_front").id
+            self.camera_top = mujoco.MjvCamera()
+            self.camera_top.type = mujoco.mjtCamera.mjCAMERA_FIXED
+            self.camera_top.fixedcamid = self.model.camera("camera_top").id
+            self._image_front = np.empty((height, width, 3), dtype=np.uint8)
+            self._image_top = np.empty((height, width, 3), dtype=np.uint8)
+            if self.async_render:
+                # Double buffering, the images of a step are rendered while the previous ones are returned
+                self._image_buffers = [
+                    (self._image_front, self._image_top),
+                    (np.empty((height, width, 3), dtype=np.uint8), np.empty((height, width, 3), dtype=np.uint8)),
+                ]
+                self._render_idx = 0
+                self._render_future = None
+            if self.image_layout == "chw":
+                self._image_front_chw = np.empty((3, height, width), dtype=np.uint8)
+                self._image_top_chw = np.empty((3, height, width), dtype=np.uint8)
         if self.observation_mode in ["state", "both"]:
-            observation_subspaces["object_qpos"] = spaces.Box(low=-10.0, high=10.0, shape=(3,))
+            observation_subspaces["object_qpos"] = spaces.Box(low=-10.0, high=10.0, shape=(3,), dtype=obs_dtype)
         self.observation_space = gym.spaces.Dict(observation_subspaces)
+        # Preallocated observation dict of step, the state buffers are filled in place and the image keys point to the
+        # rendered buffers
+        self._observation = self._new_state_observation()
 
         self.step_idx = 0
         # information dict
@@ -142,6 +244,27 @@ class LiftCubeEnv(Env):
         self.q0[3] += 1.57
         self.cube_origin_pos = [0.03390873, 0.22571199, 0.04]
 
+        # Affine map from the normalized joint actions to the target joint positions, and its output buffer
+        self._act_scale = (self.target_high - self.target_low) / 2
+        self._act_bias = self.q0
+        self._ctrl_buf = np.empty(6)
+
+        # Cache the ids of the bodies read at every step
+        self._ee_body_id = self.model.body("moving_side").id
+        self._diff_buf = np.zeros(3)
+
+        # Preallocate the inverse kinematics buffers
+        self._jac = np.zeros((3, self.model.nv))
+        self._jac_arm = np.zeros((3, 6))
+        self._ik_error = np.zeros(3)
+        self._eye = np.eye(6)
+        self._qdot = np.zeros(6)
+        self._ik_qpos0 = np.zeros(6)
+        self._nullspace_qdot = np.zeros(6)
+
+        # Compile the inverse kinematics step ahead of the first action
+        _ik_inner(self._jac_arm, np.zeros(6), self._ik_error, np.zeros(6), self._eye, 1e-6, 0.05, self._qdot)
+
 
     def inverse_kinematics(self, ee_target_pos, step=0.2, joint_name="moving_side", nb_dof=6, regularization=1e-6, home_position=None, nullspace_weight=1.):
         """
@@ -159,50 +282,51 @@ class LiftCubeEnv(Env):
         if home_position is None:
             home_position = np.zeros(nb_dof)  # Default to zero if no home position is provided
 
-        try:
-            # Get the joint ID from the name
-            joint_id = self.model.body(joint_name).id
-        except KeyError:
-            raise ValueError(f"Body name '{joint_name}' not found in the model.")
+        if joint_name == "moving_side":
+            joint_id = self._ee_body_id
+        else:
+            try:
+                # Get the joint ID from the name
+                joint_id = self.model.body(joint_name).id
+            except KeyError:
+                raise ValueError(f"Body name '{joint_name}' not found in the model.")
         
         ERROR_TOLERANCE = 1e-2
+        MIN_STEP_NORM = 1e-4
         MAX_ITERATIONS = 5
         i = 0
         # Get the current end effector position
         ee_pos = self.data.xpos[joint_id]
-        error = ee_target_pos - ee_pos
-        jac = np.zeros((3, self.model.nv))
-        q_pos = self.data.qpos[7:13].copy()
-        Kn = np.ones(nb_dof) * nullspace_weight
+        error = self._ik_error
+        np.subtract(ee_target_pos, ee_pos, out=error)
+        jac = self._jac
+        eye = self._eye
+        q_pos = self._ik_qpos0
+        np.copyto(q_pos, self.data.qpos[7:13])
+        nullspace_qdot = np.subtract(home_position, q_pos, out=self._nullspace_qdot)
+        nullspace_qdot *= nullspace_weight
 
         while np.linalg.norm(error) > ERROR_TOLERANCE and i < MAX_ITERATIONS:
-            # Compute the Jacobian
+            # Compute the Jacobian, only the body positions and the com-based motion dofs are needed
             # mujoco.mj_step(self.model, self.data)
-            mujoco.mj_forward(self.model, self.data)
+            mujoco.mj_kinematics(self.model, self.data)
+            mujoco.mj_comPos(self.model, self.data)
             mujoco.mj_jac(self.model, self.data, jac, None, ee_target_pos, joint_id)
+            np.copyto(self._jac_arm, jac[:, 6:12])
             ee_pos = self.data.xpos[joint_id].astype(np.float32)
 
             # Compute the difference between target and current end effector positions
-            error = ee_target_pos - ee_pos
-
-            # Compute the pseudoinverse of the Jacobian with damping, nv has 12 values
-            jac_reg = jac[:, 6:12].T @ jac[:, 6:12] + regularization * np.eye(nb_dof)
-            jac_pinv = np.linalg.inv(jac_reg) @ jac[:, 6:12].T
+            np.subtract(ee_target_pos, ee_pos, out=error)
 
-            # Compute target joint velocities
-            qdot = jac_pinv @ error
-            # try to keep the joint close to home position, otherwise the robot will move even if the target is reached
-            qdot += (np.eye(nb_dof) - np.linalg.pinv(jac[:, 6:12]) @ jac[:, 6:12]) @ (Kn * (home_position - q_pos))
-
-
-            # Normalize joint velocities to avoid excessive movements
-            qdot_norm = np.linalg.norm(qdot)
-            if qdot_norm > 1.0:
-                qdot /= qdot_norm
-
-            # Update the joint positions
-            self.data.qpos[7:13] += qdot * step
+            # Update the joint positions with a damped least-squares step, nv has 12 values
+            _ik_inner(
+                self._jac_arm, self.data.qpos[7:13], error, nullspace_qdot, eye, regularization, step, self._qdot
+            )
             i += 1
+
+            # Stop early once the joints barely move
+            if np.linalg.norm(self._qdot) * step < MIN_STEP_NORM:
+                break
         q_target_pos = self.data.qpos[7:13].copy()
         self.data.qpos[7:13] = q_pos
         # if i == MAX_ITERATIONS:
@@ -226,41 +350,105 @@ class LiftCubeEnv(Env):
             ee_action, gripper_action = action[:3], action[-1]
 
             # Update the robot position based on the action
-            ee_id = self.model.body("moving_side").id
-            ee_target_pos = self.data.xpos[ee_id] + ee_action
+            ee_target_pos = self.data.xpos[self._ee_body_id] + ee_action
 
             # Use inverse kinematics to get the joint action wrt the end effector current position and displacement
             target_qpos = self.inverse_kinematics(ee_target_pos=ee_target_pos, joint_name="moving_side", home_position=self.q0, step=0.05)
             target_qpos[-1:] = gripper_action
         elif self.action_mode == "joint":
-            target_qpos = action * (self.target_high - self.target_low) / 2 + self.q0
+            target_qpos = self._ctrl_buf
+            np.multiply(action, self._act_scale, out=target_qpos)
+            np.add(target_qpos, self._act_bias, out=target_qpos)
         else:
             raise ValueError("Invalid action mode, must be 'ee' or 'joint'")
-        for i in range(int(200 / self.control_freq)):
-            # Set the target position
-            self.data.ctrl = target_qpos
-            # Step the simulation forward
-            mujoco.mj_step(self.model, self.data)
-            if self.render_mode == "human":
+        # Set the target position
+        self.data.ctrl = target_qpos
+
+        # Step the simulation forward, the viewer is synced at every substep
+        n_substeps = int(200 / self.control_freq)
+        if self.render_mode == "human":
+            for _ in range(n_substeps):
+                mujoco.mj_step(self.model, self.data)
                 self.viewer.sync()
+        else:
+            mujoco.mj_step(self.model, self.data, nstep=n_substeps)
+
+    def _render_into(self, image_front, image_top):
+        self.renderer_front.render(out=image_front)
+        self.renderer_top.render(out=image_top)
+
+    def _update_scenes(self):
+        self.renderer_front.update_scene(self.data, camera=self.camera_front)
+        self.renderer_top.update_scene(self.data, camera=self.camera_top)
+
+    def _render_images(self):
+        if not self.async_render:
+            self._update_scenes()
+            self._render_into(self._image_front, self._image_top)
+            return self._image_front, self._image_top
+
+        # Wait for the images of the previous step, the scenes can't be updated while they are rendered
+        if self._render_future is not None:
+            self._render_future.result()
+        images = self._image_buffers[self._render_idx]
+
+        # Render the current state into the other buffers in the background
+        self._update_scenes()
+        self._render_idx ^= 1
+        self._render_future = self._render_pool.submit(self._render_into, *self._image_buffers[self._render_idx])
+        return images
+
+    def _render_reset_images(self):
+        # Render into new arrays, the buffers returned by the last step are left untouched
+        image_front = np.empty_like(self._image_front)
+        image_top = np.empty_like(self._image_top)
+        if self.async_render:
+            if self._render_future is not None:
+                self._render_future.result()
+                self._render_future = None
+            self._update_scenes()
+            self._render_pool.submit(self._render_into, image_front, image_top).result()
+            # The first step returns the images of the reset state, store them in the buffers it will return, which
+            # are not the ones returned by the last step
+            np.copyto(self._image_buffers[self._render_idx][0], image_front)
+            np.copyto(self._image_buffers[self._render_idx][1], image_top)
+        else:
+            self._update_scenes()
+            self._render_into(image_front, image_top)
+        return image_front, image_top
+
+    def _new_state_observation(self):
+        return {
+            key: np.zeros(space.shape, dtype=space.dtype)
+            for key, space in self.observation_space.items()
+            if key not in ["image_front", "image_top"]
+        }
 
-    def get_observation(self):
+    def _fill_state_observation(self, observation):
         # qpos is [x, y, z, qw, qx, qy, qz, q1, q2, q3, q4, q5, q6, gripper]
         # qvel is [vx, vy, vz, wx, wy, wz, dq1, dq2, dq3, dq4, dq5, dq6, dgripper]
-        ee_id = self.model.body("moving_side").id
-        observation = {
-            # "arm_qpos": self.data.qpos[7:13].astype(np.float32),
-            # "arm_qvel": self.data.qvel[6:12].astype(np.float32),
-            "ee_pos": self.data.xpos[ee_id].astype(np.float32),
-            "gripper_qpos": np.array([self.data.qpos[12].astype(np.float32)])
-        }
-        if self.observation_mode in ["image", "both"]:
-            self.renderer.update_scene(self.data, camera="camera_front")
-            observation["image_front"] = self.renderer.render()
-            self.renderer.update_scene(self.data, camera="camera_top")
-            observation["image_top"] = self.renderer.render()
+        # np.copyto(observation["arm_qpos"], self.data.qpos[7:13])
+        # np.copyto(observation["arm_qvel"], self.data.qvel[6:12])
+        np.copyto(observation["ee_pos"], self.data.xpos[self._ee_body_id])
+        np.copyto(observation["gripper_qpos"], self.data.qpos[12:13])
         if self.observation_mode in ["state", "both"]:
-            observation["object_qpos"] = self.data.qpos[:3].astype(np.float32)
+            np.copyto(observation["object_qpos"], self.data.qpos[:3])
+        return observation
+
+    def get_observation(self):
+        observation = self._fill_state_observation(self._observation)
+        if self.observation_mode == "state":
+            # Nothing to render
+            return observation
+        image_front, image_top = self._render_images()
+        observation["image_front"] = image_front
+        observation["image_top"] = image_top
+        if self.image_layout == "chw":
+            # Transpose the rendered images into the channel-first buffers
+            np.copyto(self._image_front_chw, image_front.transpose(2, 0, 1))
+            np.copyto(self._image_top_chw, image_top.transpose(2, 0, 1))
+            observation["image_front"] = self._image_front_chw
+            observation["image_top"] = self._image_top_chw
         return observation
 
     def reset(self, seed=None, options=None):
@@ -269,7 +457,9 @@ class LiftCubeEnv(Env):
 
         # Reset the robot to the initial position and sample the cube position
         # cube_pos = self.np_random.uniform(self.cube_low, self.cube_high)
-        cube_pos = displace_object(square_size=0.1, invert_y=False, origin_pos=self.cube_origin_pos)
+        cube_pos = displace_object(
+            square_size=0.1, invert_y=False, origin_pos=self.cube_origin_pos, np_random=self.np_random
+        )
         cube_rot = np.array([1.0, 0.0, 0.0, 0.0])
         robot_qpos = np.array([0.0, 0.0, 0.0, 0.0, 0.0, 0.0])
         self.data.qpos[:] = np.concatenate([cube_pos, cube_rot, robot_qpos])
@@ -280,29 +470,41 @@ class LiftCubeEnv(Env):
         # Step the simulation
         mujoco.mj_forward(self.model, self.data)
 
-        return self.get_observation(), {}
+        # The observation of reset is built in new arrays rather than in the buffers of step, so that an autoreset
+        # keeps the final observation of the episode intact
+        observation = self._fill_state_observation(self._new_state_observation())
+        if self.observation_mode in ["image", "both"]:
+            image_front, image_top = self._render_reset_images()
+            if self.image_layout == "chw":
+                image_front = np.ascontiguousarray(image_front.transpose(2, 0, 1))
+                image_top = np.ascontiguousarray(image_top.transpose(2, 0, 1))
+            observation["image_front"] = image_front
+            observation["image_top"] = image_top
+        return observation, {}
 
     def step(self, action):
         # Perform the action and step the simulation
         self.apply_action(action)
         is_success = False
 
-        # Get the new observation
+        # Get the new observation, in new arrays unless the buffers are reused
         observation = self.get_observation()
+        if not self.reuse_obs_buffers:
+            observation = {key: value.copy() for key, value in observation.items()}
 
         # Get the position of the cube and the distance between the end effector and the cube
         cube_pos = self.data.qpos[:3]
         cube_z = cube_pos[2]
-        ee_id = self.model.body("moving_side").id
-        ee_pos = self.data.xpos[ee_id]
-        ee_to_cube = np.linalg.norm(ee_pos - cube_pos)
-        # print(f"Cube position: {cube_pos}, EE position: {ee_pos}, Distance: {ee_to_cube}")
+        ee_pos = self.data.xpos[self._ee_body_id]
+        diff = np.subtract(ee_pos, cube_pos, out=self._diff_buf)
+        ee_to_cube_sq = diff @ diff
+        # print(f"Cube position: {cube_pos}, EE position: {ee_pos}, Distance: {math.sqrt(ee_to_cube_sq)}")
 
-        # Compute the reward
+        # Compute the reward, the success check compares squared distances
         reward_height = cube_z - self.threshold_height
-        reward_distance = -ee_to_cube
+        reward_distance = -math.sqrt(ee_to_cube_sq)
         reward = reward_height + reward_distance
-        if ee_to_cube < 0.05:
+        if ee_to_cube_sq < 0.05**2:
             is_success = True
             self.done = True
         self.info["is_success"] = is_success
@@ -324,6 +526,15 @@ class LiftCubeEnv(Env):
         if self.render_mode == "human":
             self.viewer.close()
         if self.observation_mode in ["image", "both"]:
-            self.renderer.close()
+            if self.async_render:
+                # Drain the in-flight rendering and release the renderers on their own thread
+                if self._render_future is not None:
+                    self._render_future.result()
+                self._render_pool.submit(self.renderer_front.close).result()
+                self._render_pool.submit(self.renderer_top.close).result()
+                self._render_pool.shutdown(wait=True)
+            else:
+                self.renderer_front.close()
+                self.renderer_top.close()
         if self.render_mode == "rgb_array":
             self.rgb_array_renderer.close()
@@ -0,0 +1,236 @@
+import os
+
+import gymnasium as gym
+import mujoco
+import numpy as np
+from gymnasium import spaces
+from gymnasium.utils import seeding
+
+from gym_lowcostrobot import ASSETS_PATH
+
+try:
+    import jax
+    import jax.numpy as jnp
+    from mujoco import mjx
+except ImportError as e:
+    raise ImportError(
+        "LiftCubeEnvMJX requires JAX and MuJoCo MJX, install them with `pip install gym_lowcostrobot[mjx]`"
+    ) from e
+
+
+def load_model():
+    """
+    Loads `lift_cube.xml` for MJX, with the meshes compiled with their convex hull as MJX requires, and only the floor,
+    the cube and the gripper fingers colliding to keep the number of contacts small.
+
+    :return: mujoco.MjModel of the task
+    """
+    with open(os.path.join(ASSETS_PATH, "lift_cube.xml")) as f:
+        xml = f.read().replace('convexhull="false"', 'convexhull="true"')
+    assets = {}
+    for name in os.listdir(ASSETS_PATH):
+        if name.endswith(".stl"):
+            with open(os.path.join(ASSETS_PATH, name), "rb") as f:
+                assets[name] = f.read()
+    model = mujoco.MjModel.from_xml_string(xml, assets)
+
+    # The other arm meshes are visual only
+    finger_mesh_ids = [model.mesh("static_side").id, model.mesh("moving_side").id]
+    colliding = np.isin(np.arange(model.ngeom), [model.geom("floor").id, model.geom("cube").id])
+    colliding |= (model.geom_type == mujoco.mjtGeom.mjGEOM_MESH) & np.isin(model.geom_dataid, finger_mesh_ids)
+    model.geom_contype[~colliding] = 0
+    model.geom_conaffinity[~colliding] = 0
+    return model
+
+
+def reset_one(m, data, key, cube_origin_pos):
+    """
+    Resets one copy of the task, with the arm at its zero position and the cube sampled in front of the robot.
+
+    :param m: mjx.Model of the task
+    :param data: mjx.Data to start from, its positions are overwritten
+    :param key: JAX random key used to sample the cube position
+    :param cube_origin_pos: array of the center of the square in which the cube is sampled, shape (3,)
+    :return: mjx.Data of the reset task
+    """
+    cube_pos = cube_origin_pos.at[:2].add(jax.random.uniform(key, (2,), minval=-0.05, maxval=0.05))
+    cube_rot = jnp.array([1.0, 0.0, 0.0, 0.0])
+    robot_qpos = jnp.zeros(6)
+    data = data.replace(qpos=jnp.concatenate([cube_pos, cube_rot, robot_qpos]), qvel=jnp.zeros_like(data.qvel))
+    return mjx.forward(m, data)
+
+
+def step_one(m, data, n_substeps):
+    """
+    Steps one copy of the task for a control period, the target joint positions being already set in `data.ctrl`.
+
+    :param m: mjx.Model of the task
+    :param data: mjx.Data of the task
+    :param n_substeps: int, the number of physics steps of a control period
+    :return: mjx.Data after the control period
+    """
+    return jax.lax.fori_loop(0, n_substeps, lambda _, d: mjx.step(m, d), data)
+
+
+def lift_cube_reward(ee_pos, cube_pos, threshold):
+    """
+    Computes the rewards and the success flags of a batch of tasks, same as `LiftCubeEnv`.
+
+    :param ee_pos: array of end effector positions, shape (B, 3)
+    :param cube_pos: array of cube positions, shape (B, 3)
+    :param threshold: float, height threshold of the cube
+    :return: arrays of the rewards and of whether the end effector is within 5 cm of the cube, shape (B,)
+    """
+    diff = ee_pos - cube_pos
+    d2 = jnp.sum(diff * diff, axis=-1)
+    return cube_pos[:, 2] - threshold - jnp.sqrt(d2), d2 < 0.05**2
+
+
+class LiftCubeEnvMJX(gym.vector.VectorEnv):
+    """
+    ## Description
+
+    Version of `LiftCubeEnv` simulated with MuJoCo MJX, `num_envs` copies of the task are stepped together on the JAX
+    default device, typically a GPU. Reset, step and reward are pure JAX functions (`reset_one`, `step_one` and
+    `lift_cube_reward`), vectorized with `jax.vmap` and compiled once with `jax.jit`.
+
+    The task is loaded from `lift_cube.xml` by `load_model`, in which the meshes are compiled with their convex hull, as
+    MJX requires, and only the floor, the cube and the gripper fingers collide to keep the number of contacts small. The
+    first call to `reset` and `step` compiles the simulation, which takes a while.
+
+    Only the "joint" action mode and the "state" observation mode of `LiftCubeEnv` are supported.
+
+    ## Action space
+
+    The action space is a `(num_envs, 6)` box, each row being the normalized target joint positions of one
+    sub-environment, see `LiftCubeEnv`.
+
+    ## Observation space
+
+    The observation space is a dictionary of batched arrays:
+
+    - `"ee_pos"`: the position of the end effector, as (x, y, z), shape (num_envs, 3)
+    - `"gripper_qpos"`: the angle of the gripper joint in radians, shape (num_envs, 1)
+    - `"object_qpos"`: the position of the cube, as (x, y, z), shape (num_envs, 3)
+
+    ## Reward
+
+    Same as `LiftCubeEnv`, `info["is_success"]` flags the sub-environments whose end effector is within 5 cm of the
+    cube.
+
+    ## Episode end
+
+    A sub-environment is truncated after `episode_length` steps and is then reset automatically within the same call to
+    `step`. Its last observation is stored in `info["final_observation"]`, and `info["_final_observation"]` flags which
+    sub-environments were reset.
+
+    ## Arguments
+
+    - `num_envs (int)`: the number of sub-environments, default is 1024.
+    """
+
+    metadata = {"render_modes": [], "render_fps": 50}
+
+    def __init__(self, num_envs=1024):
+        # Load the MuJoCo model and put it on the device
+        self.model = load_model()
+        self.mjx_model = mjx.put_model(self.model)
+        self._data0 = mjx.make_data(self.mjx_model)
+
+        # Set the action and observation spaces
+        self.single_action_space = spaces.Box(low=-1.0, high=1.0, shape=(6,), dtype=np.float32)
+        self.single_observation_space = spaces.Dict(
+            {
+                "ee_pos": spaces.Box(low=-10, high=10, shape=(3,)),
+                "gripper_qpos": spaces.Box(low=-np.pi, high=np.pi, shape=(1,)),
+                "object_qpos": spaces.Box(low=-10.0, high=10.0, shape=(3,)),
+            }
+        )
+        super().__init__(num_envs, self.single_observation_space, self.single_action_space)
+
+        # Set additional utils, same as LiftCubeEnv
+        self.control_freq = 50
+        self.n_substeps = int(200 / self.control_freq)
+        self.threshold_height = 0.5
+        self.episode_length = 200
+        self.target_low = np.array([-3.14159, -1.5708, -1.48353, -1.91986, -2.96706, -1.74533])
+        self.target_high = np.array([3.14159, 1.22173, 1.74533, 1.91986, 2.96706, 0.0523599])
+        self.q0 = (self.target_high + self.target_low) / 2  # home position
+        self.q0[3] += 1.57
+        self._act_scale = (self.target_high - self.target_low) / 2
+        self.cube_origin_pos = np.array([0.03390873, 0.22571199, 0.04])
+        self._ee_id = self.model.body("moving_side").id
+
+        # Compile the batched reset and step, the model is passed as an argument rather than baked in as a constant
+        self._reset_fn = jax.jit(self._reset_batch)
+        self._step_fn = jax.jit(self._step_batch)
+        self._data = None
+        self._step_idx = None
+        self._key = jax.random.PRNGKey(seeding.np_random()[0].integers(2**31))
+
+    def _reset_batch(self, m, key):
+        keys = jax.random.split(key, self.num_envs)
+        reset = jax.vmap(reset_one, in_axes=(None, None, 0, None))
+        return reset(m, self._data0, keys, jnp.asarray(self.cube_origin_pos))
+
+    def _observation(self, data):
+        # qpos is [x, y, z, qw, qx, qy, qz, q1, q2, q3, q4, q5, q6, gripper]
+        return {
+            "ee_pos": data.xpos[:, self._ee_id],
+            "gripper_qpos": data.qpos[:, 12:13],
+            "object_qpos": data.qpos[:, :3],
+        }
+
+    def _step_batch(self, m, data, actions, step_idx, key):
+        # Scale the actions to the joint ranges and step all the sub-environments
+        data = data.replace(ctrl=actions * jnp.asarray(self._act_scale) + jnp.asarray(self.q0))
+        data = jax.vmap(step_one, in_axes=(None, 0, None))(m, data, self.n_substeps)
+        observation = self._observation(data)
+        rewards, is_success = lift_cube_reward(observation["ee_pos"], observation["object_qpos"], self.threshold_height)
+        step_idx = step_idx + 1
+        truncated = step_idx >= self.episode_length
+
+        # Reset the sub-environments that reached the end of their episode, only when there are some
+        def autoreset(data, key):
+            key, reset_key = jax.random.split(key)
+            reset_data = self._reset_batch(m, reset_key)
+
+            def select(reset_value, value):
+                return jnp.where(truncated.reshape((-1,) + (1,) * (value.ndim - 1)), reset_value, value)
+
+            return jax.tree_util.tree_map(select, reset_data, data), key
+
+        data, key = jax.lax.cond(truncated.any(), autoreset, lambda data, key: (data, key), data, key)
+        info = {"step": step_idx, "is_success": is_success}
+        step_idx = jnp.where(truncated, 0, step_idx)
+        return data, step_idx, key, observation, self._observation(data), rewards, truncated, info
+
+    def reset(self, seed=None, options=None):
+        if seed is not None:
+            self._key = jax.random.PRNGKey(seed)
+        self._key, reset_key = jax.random.split(self._key)
+        self._data = self._reset_fn(self.mjx_model, reset_key)
+        self._step_idx = jnp.zeros(self.num_envs, dtype=jnp.int32)
+        return {key: np.asarray(value) for key, value in self._observation(self._data).items()}, {}
+
+    def step(self, actions):
+        (
+            self._data,
+            self._step_idx,
+            self._key,
+            final_observation,
+            observation,
+            rewards,
+            truncated,
+            info,
+        ) = self._step_fn(self.mjx_model, self._data, jnp.asarray(actions), self._step_idx, self._key)
+
+        # Bring the results back to the host
+        truncated = np.asarray(truncated)
+        observation = {key: np.asarray(value) for key, value in observation.items()}
+        terminated = np.zeros(self.num_envs, dtype=bool)
+        info = {key: np.asarray(value) for key, value in info.items()}
+        if truncated.any():
+            info["final_observation"] = {key: np.asarray(value) for key, value in final_observation.items()}
+            info["_final_observation"] = truncated
+        return observation, np.asarray(rewards), terminated, truncated, info
@@ -1,3 +1,4 @@
+import math
 import os
 
 import gymnasium as gym
@@ -45,8 +46,10 @@ class ReachCubeEnv(Env):
 
     - `"arm_qpos"`: the joint angles of the robot arm in radians, shape (6,)
     - `"arm_qvel"`: the joint velocities of the robot arm in radians per second, shape (6,)
-    - `"image_front"`: the front image of the camera of size (240, 320, 3)
-    - `"image_top"`: the top image of the camera of size (240, 320, 3)
+    - `"image_front"`: the front image of the camera of size (height, width, 3), or (3, height, width) in "chw" image
+        layout, (240, 320, 3) by default
+    - `"image_top"`: the top image of the camera of size (height, width, 3), or (3, height, width) in "chw" image
+        layout, (240, 320, 3) by default
     - `"cube_pos"`: the position of the cube, as (x, y, z)
 
     Three observation modes are available: "image" (default), "state", and "both".
@@ -59,6 +62,10 @@ class ReachCubeEnv(Env):
     | `"image_top"`   | ✓         |           | ✓        |
     | `"cube_pos"`    |           | ✓         | ✓        |
 
+    By default, `reset` and `step` return new arrays at every call. With `reuse_obs_buffers=True`, the observation dict
+    returned by `step` and its arrays, images included, are reused from one step to the next: they are only valid until
+    the next call to `step`, copy them if they need to be kept.
+
     ## Reward
 
     The reward is the sum of two terms: the height of the cube above the threshold and the negative distance between the
@@ -70,11 +77,28 @@ class ReachCubeEnv(Env):
         section "Observation space".
     - `action_mode (str)`: the action mode, can be "joint" or "ee", default is "joint", see section "Action space".
     - `render_mode (str)`: the render mode, can be "human" or "rgb_array", default is None.
+    - `image_layout (str)`: the memory layout of the images, can be "hwc" (height, width, channel) or "chw" (channel,
+        height, width), default is "hwc". The "chw" images are contiguous, ready for channel-first policies.
+    - `image_size (tuple)`: the (height, width) of the images, default is (240, 320). Smaller images are cheaper to
+        render and to move to the policy.
+    - `obs_dtype (type)`: the dtype of the non-image observations, default is np.float32. np.float16 halves their
+        size.
+    - `reuse_obs_buffers (bool)`: whether `step` returns the same preallocated observation buffers at every step
+        instead of new arrays, default is False. This saves an allocation per step, see section "Observation space".
     """
 
     metadata = {"render_modes": ["human", "rgb_array"], "render_fps": 200}
 
-    def __init__(self, observation_mode="image", action_mode="joint", render_mode=None):
+    def __init__(
+        self,
+        observation_mode="image",
+        action_mode="joint",
+        render_mode=None,
+        image_layout="hwc",
+        image_size=(240, 320),
+        obs_dtype=np.float32,
+        reuse_obs_buffers=False,
+    ):
         # Load the MuJoCo model and data
         self.model = mujoco.MjModel.from_xml_path(os.path.join(ASSETS_PATH, "reach_cube.xml"), {})
         self.data = mujoco.MjData(self.model)
@@ -86,17 +110,38 @@ class ReachCubeEnv(Env):
 
         # Set the observations space
         self.observation_mode = observation_mode
+        self.image_layout = image_layout
+        self.reuse_obs_buffers = reuse_obs_buffers
+        self.image_size = image_size
+        height, width = image_size
+        image_shape = {"hwc": (height, width, 3), "chw": (3, height, width)}[image_layout]
         observation_subspaces = {
-            "arm_qpos": spaces.Box(low=-np.pi, high=np.pi, shape=(6,)),
-            "arm_qvel": spaces.Box(low=-10.0, high=10.0, shape=(6,)),
+            "arm_qpos": spaces.Box(low=-np.pi, high=np.pi, shape=(6,), dtype=obs_dtype),
+            "arm_qvel": spaces.Box(low=-10.0, high=10.0, shape=(6,), dtype=obs_dtype),
         }
         if self.observation_mode in ["image", "both"]:
-            observation_subspaces["image_front"] = spaces.Box(0, 255, shape=(240, 320, 3), dtype=np.uint8)
-            observation_subspaces["image_top"] = spaces.Box(0, 255, shape=(240, 320, 3), dtype=np.uint8)
-            self.renderer = mujoco.Renderer(self.model)
+            observation_subspaces["image_front"] = spaces.Box(0, 255, shape=image_shape, dtype=np.uint8)
+            observation_subspaces["image_top"] = spaces.Box(0, 255, shape=image_shape, dtype=np.uint8)
+            # One renderer per camera, each rendering into a preallocated image buffer
+            self.renderer_front = mujoco.Renderer(self.model, height, width)
+            self.renderer_top = mujoco.Renderer(self.model, height, width)
+            self.camera_front = mujoco.MjvCamera()
+            self.camera_front.type = mujoco.mjtCamera.mjCAMERA_FIXED
+            self.camera_front.fixedcamid = self.model.camera("camera_front").id
+            self.camera_top = mujoco.MjvCamera()
+            self.camera_top.type = mujoco.mjtCamera.mjCAMERA_FIXED
+            self.camera_top.fixedcamid = self.model.camera("camera_top").id
+            self._image_front = np.empty((height, width, 3), dtype=np.uint8)
+            self._image_top = np.empty((height, width, 3), dtype=np.uint8)
+            if self.image_layout == "chw":
+                self._image_front_chw = np.empty((3, height, width), dtype=np.uint8)
+                self._image_top_chw = np.empty((3, height, width), dtype=np.uint8)
         if self.observation_mode in ["state", "both"]:
-            observation_subspaces["object_qpos"] = spaces.Box(low=-10.0, high=10.0, shape=(3,))
+            observation_subspaces["object_qpos"] = spaces.Box(low=-10.0, high=10.0, shape=(3,), dtype=obs_dtype)
         self.observation_space = gym.spaces.Dict(observation_subspaces)
+        # Preallocated observation dict of step, the state buffers are filled in place and the image keys point to the
+        # rendered buffers
+        self._observation = self._new_state_observation()
         self.cameras = ["image_front", "image_top"]
 
 
@@ -118,6 +163,26 @@ class ReachCubeEnv(Env):
         self.target_high = np.array([3.14159, 1.22173, 1.74533, 1.91986, 2.96706, 0.0523599])
         self.q0 = (self.target_high + self.target_low) / 2 # home position
 
+        # Affine map from the normalized joint actions to the target joint positions, and its output buffer
+        self._act_scale = (self.target_high - self.target_low) / 2
+        self._act_bias = self.q0
+        self._ctrl_buf = np.empty(6)
+
+        # Cache the ids of the bodies read at every step
+        self._ee_body_id = self.model.body("moving_side").id
+        self._cube_body_id = self.model.body("cube").id
+
+        # Buffer of the end effector to cube difference, reused at every step
+        self._diff_buf = np.zeros(3)
+
+        # Preallocate the inverse kinematics buffers
+        self._jac = np.zeros((3, self.model.nv))
+        self._jac_arm = np.zeros((3, 6))
+        self._jac_arm_t = np.zeros((6, 3))
+        self._eye = np.eye(6)
+        self._ik_error = np.zeros(3)
+        self._ik_qpos0 = np.zeros(6)
+        self._nullspace_qdot = np.zeros(6)
 
     def inverse_kinematics(self, ee_target_pos, step=0.2, joint_name="moving_side", nb_dof=6, regularization=1e-6, home_position=None, nullspace_weight=1.):
         """
@@ -135,11 +200,14 @@ class ReachCubeEnv(Env):
         if home_position is None:
             home_position = np.zeros(nb_dof)  # Default to zero if no home position is provided
 
-        try:
-            # Get the joint ID from the name
-            joint_id = self.model.body(joint_name).id
-        except KeyError:
-            raise ValueError(f"Body name '{joint_name}' not found in the model.")
+        if joint_name == "moving_side":
+            joint_id = self._ee_body_id
+        else:
+            try:
+                # Get the joint ID from the name
+                joint_id = self.model.body(joint_name).id
+            except KeyError:
+                raise ValueError(f"Body name '{joint_name}' not found in the model.")
         
         ERROR_TOLERANCE = 1e-2
         MAX_ITERATIONS = 10
@@ -147,10 +215,15 @@ class ReachCubeEnv(Env):
         # Get the current end effector position
         # ee_pos = self.d.geom_xpos[joint_id]
         ee_pos = self.data.geom_xpos[joint_id]
-        error = ee_target_pos - ee_pos
-        jac = np.zeros((3, self.model.nv))
-        q_pos = self.data.qpos[7:13].copy()
-        Kn = np.ones(nb_dof) * nullspace_weight
+        error = np.subtract(ee_target_pos, ee_pos, out=self._ik_error)
+        jac = self._jac
+        jac_arm = self._jac_arm
+        jac_arm_t = self._jac_arm_t
+        eye = self._eye
+        q_pos = self._ik_qpos0
+        np.copyto(q_pos, self.data.qpos[7:13])
+        nullspace_qdot = np.subtract(home_position, q_pos, out=self._nullspace_qdot)
+        nullspace_qdot *= nullspace_weight
 
         while np.linalg.norm(error) > ERROR_TOLERANCE and i < MAX_ITERATIONS:
             # Compute the Jacobian
@@ -159,17 +232,21 @@ class ReachCubeEnv(Env):
             mujoco.mj_jac(self.model, self.data, jac, None, ee_target_pos, joint_id)
             ee_pos = self.data.xpos[joint_id].astype(np.float32)
 
+            # Copy the arm columns of the Jacobian into contiguous buffers, nv has 12 values
+            np.copyto(jac_arm, jac[:, 6:12])
+            np.copyto(jac_arm_t, jac_arm.T)
+
             # Compute the difference between target and current end effector positions
-            error = ee_target_pos - ee_pos
+            np.subtract(ee_target_pos, ee_pos, out=error)
 
-            # Compute the pseudoinverse of the Jacobian with damping, nv has 12 values
-            jac_reg = jac[:, 6:12].T @ jac[:, 6:12] + regularization * np.eye(nb_dof)
-            jac_pinv = np.linalg.inv(jac_reg) @ jac[:, 6:12].T
+            # Compute the pseudoinverse of the Jacobian with damping
+            jac_reg = jac_arm_t @ jac_arm + regularization * eye
+            jac_pinv = np.linalg.inv(jac_reg) @ jac_arm_t
 
             # Compute target joint velocities
             qdot = jac_pinv @ error
             # try to keep the joint close to home position, otherwise the robot will move even if the target is reached
-            qdot += (np.eye(nb_dof) - np.linalg.pinv(jac[:, 6:12]) @ jac[:, 6:12]) @ (Kn * (home_position - q_pos))
+            qdot += (eye - np.linalg.pinv(jac_arm) @ jac_arm) @ nullspace_qdot
 
 
             # Normalize joint velocities to avoid excessive movements
@@ -203,14 +280,15 @@ class ReachCubeEnv(Env):
             ee_action, gripper_action = action[:3], action[-1]
 
             # Update the robot position based on the action
-            ee_id = self.model.body("moving_side").id
-            ee_target_pos = self.data.xpos[ee_id] + ee_action
+            ee_target_pos = self.data.xpos[self._ee_body_id] + ee_action
 
             # Use inverse kinematics to get the joint action wrt the end effector current position and displacement
             target_qpos = self.inverse_kinematics(ee_target_pos=ee_target_pos, joint_name="moving_side", home_position=self.q0, step=0.05)
             target_qpos[-1:] = gripper_action
         elif self.action_mode == "joint":
-            target_qpos = action * (self.target_high - self.target_low) / 2 + self.q0
+            target_qpos = self._ctrl_buf
+            np.multiply(action, self._act_scale, out=target_qpos)
+            np.add(target_qpos, self._act_bias, out=target_qpos)
         else:
             raise ValueError("Invalid action mode, must be 'ee' or 'joint'")
 
@@ -222,20 +300,37 @@ class ReachCubeEnv(Env):
         if self.render_mode == "human":
             self.viewer.sync()
 
-    def get_observation(self):
+    def _new_state_observation(self):
+        return {
+            key: np.zeros(space.shape, dtype=space.dtype)
+            for key, space in self.observation_space.items()
+            if key not in ["image_front", "image_top"]
+        }
+
+    def _fill_state_observation(self, observation):
         # qpos is [x, y, z, qw, qx, qy, qz, q1, q2, q3, q4, q5, q6, gripper]
         # qvel is [vx, vy, vz, wx, wy, wz, dq1, dq2, dq3, dq4, dq5, dq6, dgripper]
-        observation = {
-            "arm_qpos": self.data.qpos[7:13].astype(np.float32),
-            "arm_qvel": self.data.qvel[6:12].astype(np.float32),
-        }
-        if self.observation_mode in ["image", "both"]:
-            self.renderer.update_scene(self.data, camera="camera_front")
-            observation["image_front"] = self.renderer.render()
-            self.renderer.update_scene(self.data, camera="camera_top")
-            observation["image_top"] = self.renderer.render()
+        np.copyto(observation["arm_qpos"], self.data.qpos[7:13])
+        np.copyto(observation["arm_qvel"], self.data.qvel[6:12])
         if self.observation_mode in ["state", "both"]:
-            observation["object_qpos"] = self.data.qpos[:3].astype(np.float32)
+            np.copyto(observation["object_qpos"], self.data.qpos[:3])
+        return observation
+
+    def get_observation(self):
+        observation = self._fill_state_observation(self._observation)
+        if self.observation_mode == "state":
+            # Nothing to render
+            return observation
+        self.renderer_front.update_scene(self.data, camera=self.camera_front)
+        observation["image_front"] = self.renderer_front.render(out=self._image_front)
+        self.renderer_top.update_scene(self.data, camera=self.camera_top)
+        observation["image_top"] = self.renderer_top.render(out=self._image_top)
+        if self.image_layout == "chw":
+            # Transpose the rendered images into the channel-first buffers
+            np.copyto(self._image_front_chw, self._image_front.transpose(2, 0, 1))
+            np.copyto(self._image_top_chw, self._image_top.transpose(2, 0, 1))
+            observation["image_front"] = self._image_front_chw
+            observation["image_top"] = self._image_top_chw
         return observation
 
     def reset(self, seed=None, options=None):
@@ -251,19 +346,35 @@ class ReachCubeEnv(Env):
         # Step the simulation
         mujoco.mj_forward(self.model, self.data)
 
-        return self.get_observation(), {}
+        # The observation of reset is built in new arrays rather than in the buffers of step, so that an autoreset
+        # keeps the final observation of the episode intact
+        observation = self._fill_state_observation(self._new_state_observation())
+        if self.observation_mode in ["image", "both"]:
+            self.renderer_front.update_scene(self.data, camera=self.camera_front)
+            image_front = self.renderer_front.render()
+            self.renderer_top.update_scene(self.data, camera=self.camera_top)
+            image_top = self.renderer_top.render()
+            if self.image_layout == "chw":
+                image_front = np.ascontiguousarray(image_front.transpose(2, 0, 1))
+                image_top = np.ascontiguousarray(image_top.transpose(2, 0, 1))
+            observation["image_front"] = image_front
+            observation["image_top"] = image_top
+        return observation, {}
 
     def step(self, action):
         # Perform the action and step the simulation
         self.apply_action(action)
 
-        # Get the new observation
+        # Get the new observation, in new arrays unless the buffers are reused
         observation = self.get_observation()
+        if not self.reuse_obs_buffers:
+            observation = {key: value.copy() for key, value in observation.items()}
 
         # Get the position of the cube and the distance between the end effector and the cube
-        cube_pos = self.data.xpos[2]
-        ee_pos = self.data.xpos[8]
-        ee_to_cube = np.linalg.norm(ee_pos - cube_pos)
+        cube_pos = self.data.xpos[self._cube_body_id]
+        ee_pos = self.data.xpos[self._ee_body_id]
+        diff = np.subtract(ee_pos, cube_pos, out=self._diff_buf)
+        ee_to_cube = math.sqrt(diff @ diff)
 
         # Compute the reward
         reward = -ee_to_cube
@@ -280,6 +391,7 @@ class ReachCubeEnv(Env):
         if self.render_mode == "human":
             self.viewer.close()
         if self.observation_mode in ["image", "both"]:
-            self.renderer.close()
+            self.renderer_front.close()
+            self.renderer_top.close()
         if self.render_mode == "rgb_array":
             self.rgb_array_renderer.close()
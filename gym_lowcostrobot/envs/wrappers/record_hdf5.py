@@ -42,7 +42,8 @@ class HDF5_Recorder:
     def capture_frame(self, observations, action):
         """Captures frame to video."""
         assert self.hdf5_file is not None
-        self.lst_observations.append(observations)
+        # The environment may reuse its observation buffers, keep a copy of them
+        self.lst_observations.append({key: np.copy(value) for key, value in observations.items()})
         self.lst_actions.append(action)
         self.recorded_frames += 1
 
@@ -54,10 +55,10 @@ class HDF5_Recorder:
             with h5py.File(self.hdf5_file, "w") as file:
                 if self.lst_observations:
                     file.create_dataset(
-                        "observations/images/camera_front", data=np.stack([item["image_front"] for item in self.lst_observations]),chunks=(1, 240, 320, 3),
+                        "observations/images/camera_front", data=np.stack([item["image_front"] for item in self.lst_observations]),chunks=(1, *self.lst_observations[0]["image_front"].shape),
                     )
                     file.create_dataset(
-                        "observations/images/camera_top", data=np.stack([item["image_top"] for item in self.lst_observations]), chunks=(1, 240, 320, 3),
+                        "observations/images/camera_top", data=np.stack([item["image_top"] for item in self.lst_observations]), chunks=(1, *self.lst_observations[0]["image_top"].shape),
                     )
                     file.create_dataset("observations/qpos", data=np.stack([item["arm_qpos"] for item in self.lst_observations]))
                     file.create_dataset("observations/qvel", data=np.stack([item["arm_qvel"] for item in self.lst_observations]))
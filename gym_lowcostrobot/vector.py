@@ -0,0 +1,40 @@
+import os
+
+import gymnasium as gym
+
+
+def _make_env(env_id, cpu, parent_pid, kwargs):
+    def _init():
+        # Pin the worker process to its CPU, the environment built by the parent process to read the spaces is left alone
+        if cpu is not None and os.getpid() != parent_pid:
+            os.sched_setaffinity(0, {cpu})
+        return gym.make(env_id, **kwargs)
+
+    return _init
+
+
+def make_async_vector_env(env_id, num_envs, pin_cpus=True, copy=False, context=None, **kwargs):
+    """
+    Creates a vector of environments, each one stepped in its own worker process.
+
+    The workers write their observations directly into shared memory, so the camera images are not pickled through a
+    pipe at every step. The rendering backend of the workers is selected by the `MUJOCO_GL` environment variable
+    ("egl" or "osmesa" for headless machines), which must be set before `mujoco` is imported.
+
+    :param env_id: str, id of the registered environment, e.g. "LiftCube-v0"
+    :param num_envs: int, number of environments
+    :param pin_cpus: bool, whether to pin each worker process to a distinct CPU, when the platform supports it
+    :param copy: bool, whether `reset` and `step` return a copy of the observations, or views on the shared memory that
+        are overwritten by the next call
+    :param context: str, multiprocessing start method, see `gymnasium.vector.AsyncVectorEnv`
+    :param kwargs: keyword arguments passed to the environment constructor, e.g. `observation_mode="image"`
+    :return: gymnasium.vector.AsyncVectorEnv
+    """
+    cpus = None
+    if pin_cpus and hasattr(os, "sched_setaffinity"):
+        cpus = sorted(os.sched_getaffinity(0))
+    parent_pid = os.getpid()
+    env_fns = [
+        _make_env(env_id, cpus[i % len(cpus)] if cpus else None, parent_pid, kwargs) for i in range(num_envs)
+    ]
+    return gym.vector.AsyncVectorEnv(env_fns, shared_memory=True, copy=copy, context=context)
@@ -8,4 +8,5 @@ setup(
     author_email="julien.perez@epita.fr",
     packages=find_packages(),
     install_requires=["gymnasium>=0.29", "mujoco>=3.0", "PyOpenGL==3.1.1a1"],
+    extras_require={"numba": ["numba", "scipy"], "mjx": ["mujoco-mjx", "jax"]},
 )
@@ -1,8 +1,11 @@
 import gymnasium as gym
+import numpy as np
 import pytest
 from gymnasium.utils.env_checker import check_env
 
 import gym_lowcostrobot  # noqa
+from gym_lowcostrobot.envs import BatchLiftCubeEnv
+from gym_lowcostrobot.vector import make_async_vector_env
 
 
 @pytest.mark.parametrize("env_id", ["LiftCube-v0", "PickPlaceCube-v0", "PushCube-v0", "ReachCube-v0", "StackTwoCubes-v0"])
@@ -11,3 +14,100 @@ def test_env_check(env_id, observation_mode):
     env = gym.make(env_id, observation_mode=observation_mode)
     check_env(env, skip_render_check=True)
     env.close()
+
+
+@pytest.mark.parametrize(
+    "env_id, kwargs",
+    [
+        ("LiftCube-v0", {"image_layout": "chw"}),
+        ("LiftCube-v0", {"async_render": True}),
+        ("LiftCube-v0", {"image_size": (120, 160), "obs_dtype": np.float16}),
+        ("ReachCube-v0", {"image_size": (120, 160), "obs_dtype": np.float16}),
+        ("LiftCube-v0", {"reuse_obs_buffers": True}),
+        ("ReachCube-v0", {"reuse_obs_buffers": True}),
+        ("ReachCube-v0", {"image_layout": "chw"}),
+    ],
+)
+def test_env_check_kwargs(env_id, kwargs):
+    env = gym.make(env_id, observation_mode="both", **kwargs)
+    check_env(env, skip_render_check=True)
+    env.close()
+
+
+@pytest.mark.parametrize("env_id", ["LiftCube-v0", "ReachCube-v0"])
+def test_final_observation(env_id):
+    # The final observation of an episode must survive the autoreset and the following steps
+    env = gym.vector.SyncVectorEnv([lambda: gym.make(env_id, observation_mode="state", max_episode_steps=3)])
+    env.reset(seed=0)
+    for _ in range(3):
+        observation, reward, terminated, truncated, info = env.step(env.action_space.sample())
+    assert truncated[0]
+    final_observation = info["final_observation"][0]
+    kept = {key: value.copy() for key, value in final_observation.items()}
+    env.step(env.action_space.sample())
+    for key, value in kept.items():
+        np.testing.assert_array_equal(final_observation[key], value)
+    assert not all(np.array_equal(value, observation[key][0]) for key, value in kept.items())
+    env.close()
+
+
+def test_async_render():
+    # With async_render, the images returned by a step are those of the previous step
+    sync_env = gym.make("LiftCube-v0", observation_mode="image")
+    async_env = gym.make("LiftCube-v0", observation_mode="image", async_render=True)
+    sync_observation, _ = sync_env.reset(seed=0)
+    async_observation, _ = async_env.reset(seed=0)
+    for key in ["image_front", "image_top"]:
+        np.testing.assert_array_equal(async_observation[key], sync_observation[key])
+    for _ in range(5):
+        previous_observation = {key: value.copy() for key, value in sync_observation.items()}
+        action = sync_env.action_space.sample()
+        sync_observation, *_ = sync_env.step(action)
+        async_observation, *_ = async_env.step(action)
+        for key in ["image_front", "image_top"]:
+            np.testing.assert_array_equal(async_observation[key], previous_observation[key])
+    sync_env.close()
+    async_env.close()
+
+
+@pytest.mark.parametrize("action_mode", ["joint", "ee"])
+def test_batch_lift_cube_env(action_mode):
+    env = BatchLiftCubeEnv(num_envs=3, action_mode=action_mode, num_workers=2)
+    observation, _ = env.reset(seed=0)
+    assert observation in env.observation_space
+    for _ in range(env.episode_length):
+        observation, reward, terminated, truncated, info = env.step(env.action_space.sample())
+        assert observation in env.observation_space
+        assert reward.shape == terminated.shape == truncated.shape == (3,)
+    assert truncated.all()
+    assert info["final_observation"]["ee_pos"].shape == (3, 3)
+    env.close()
+
+
+def test_async_vector_env():
+    env = make_async_vector_env("LiftCube-v0", num_envs=2, observation_mode="image")
+    observation, _ = env.reset(seed=0)
+    assert observation in env.observation_space
+    observation, reward, terminated, truncated, _ = env.step(env.action_space.sample())
+    assert observation["image_front"].shape == (2, 240, 320, 3)
+    assert reward.shape == terminated.shape == truncated.shape == (2,)
+    env.close()
+
+
+@pytest.mark.slow
+def test_lift_cube_env_mjx():
+    pytest.importorskip("jax")
+    pytest.importorskip("mujoco.mjx")
+    from gym_lowcostrobot.envs.lift_cube_env_mjx import LiftCubeEnvMJX
+
+    env = LiftCubeEnvMJX(num_envs=2)
+    env.episode_length = 2
+    observation, _ = env.reset(seed=0)
+    assert observation in env.observation_space
+    for _ in range(env.episode_length):
+        observation, reward, terminated, truncated, info = env.step(env.action_space.sample())
+        assert observation in env.observation_space
+        assert reward.shape == terminated.shape == truncated.shape == (2,)
+    assert truncated.all()
+    assert info["final_observation"]["ee_pos"].shape == (2, 3)
+    env.close()